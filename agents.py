@@ -1,17 +1,21 @@
 import json
 import time
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Optional, Callable
 from api import OpenRouterAPI
+from cancellation import CancellationToken
+from providers import ProviderRouter, DEFAULT_PROVIDER
 
 class Agent:
     def __init__(self, 
                  name: str, 
                  role: str, 
                  model: str, 
-                 system_message: str):
+                 system_message: str,
+                 provider: str = DEFAULT_PROVIDER):
         self.name = name
         self.role = role
         self.model = model
+        self.provider = provider
         self.system_message = system_message
         self.messages = [{"role": "system", "content": system_message}]
         self.start_time = None
@@ -31,10 +35,13 @@ class Agent:
         return self.end_time - self.start_time
 
 class CoordinatorAgent(Agent):
-    def __init__(self, name: str, model: str, system_message: str):
-        super().__init__(name, "coordinator", model, system_message)
+    def __init__(self, name: str, model: str, system_message: str, provider: str = DEFAULT_PROVIDER):
+        super().__init__(name, "coordinator", model, system_message, provider)
 
-    def analyze_task(self, user_input: str, api: OpenRouterAPI) -> Dict[str, Any]:
+    def analyze_task(self,
+                     user_input: str,
+                     api: ProviderRouter,
+                     cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """Analyze user input to determine which agents should respond"""
         self.start_processing()
 
@@ -46,7 +53,9 @@ class CoordinatorAgent(Agent):
         self.add_message("user", analysis_prompt)
         response = api.generate_completion(
             model=self.model,
-            messages=self.get_messages()
+            messages=self.get_messages(),
+            cancel_token=cancel_token,
+            provider=self.provider
         )
 
         process_time = self.end_processing()
@@ -57,6 +66,7 @@ class CoordinatorAgent(Agent):
                 return {
                     "success": True,
                     "analysis": response["response"],
+                    "tokens": response.get("tokens", 0),
                     "time": process_time
                 }
             except Exception as e:
@@ -68,6 +78,7 @@ class CoordinatorAgent(Agent):
         else:
             return {
                 "success": False,
+                "cancelled": response.get("cancelled", False),
                 "error": response["error"],
                 "time": process_time
             }
@@ -89,12 +100,19 @@ class AgentGroup:
             del self.agents[agent_name]
 
     def __init__(self, api: OpenRouterAPI):
+        # A single backend is routed to as the default provider
+        if not isinstance(api, ProviderRouter):
+            router = ProviderRouter()
+            router.add_provider(DEFAULT_PROVIDER, api)
+            api = router
         self.api = api
         self.agents = {}
         self.coordinator = None
         self.response_cache = {}
 
-    def get_response(self, agent_name: str) -> Dict[str, Any]:
+    def get_response(self,
+                     agent_name: str,
+                     cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         if agent_name not in self.agents:
             return {"success": False, "error": "Agent not found"}
             
@@ -107,7 +125,9 @@ class AgentGroup:
         agent.start_processing()
         response = self.api.generate_completion(
             model=agent.model,
-            messages=agent.get_messages()
+            messages=agent.get_messages(),
+            cancel_token=cancel_token,
+            provider=agent.provider
         )
         process_time = agent.end_processing()
 
@@ -115,8 +135,71 @@ class AgentGroup:
             response["time"] = process_time
         return response
 
-    def get_collective_response(self, user_input: str) -> Generator[Dict[str, Any], None, None]:
-        """Get coordinated responses from multiple agents, yielding intermediate results"""
+    def get_single_response(self,
+                            agent_name: str,
+                            user_input: str,
+                            cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Send user_input to one agent and add its reply to the agent's history
+
+        If the turn is cancelled the user message is removed again. A
+        successful response includes the turn's messages under "messages".
+        """
+        if agent_name not in self.agents:
+            return {"success": False, "error": "Agent not found"}
+
+        agent = self.agents[agent_name]
+        history_length = len(agent.messages)
+        agent.add_message("user", user_input)
+
+        response = None
+        try:
+            response = self.get_response(agent_name, cancel_token)
+        finally:
+            # Discard the unanswered user message
+            if response is None or response.get("cancelled"):
+                del agent.messages[history_length:]
+
+        if response["success"]:
+            agent.add_message("assistant", response["response"])
+            response["messages"] = agent.get_messages()[history_length:]
+        return response
+
+    def _history_lengths(self) -> List[tuple]:
+        agents = [self.coordinator] + list(self.agents.values())
+        return [(agent, len(agent.messages)) for agent in agents]
+
+    def _discard_turn(self,
+                      history_lengths: List[tuple],
+                      discarded_tokens: int,
+                      cancelled_calls: int,
+                      on_discard: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Roll back messages added during a cancelled turn"""
+        for agent, length in history_lengths:
+            del agent.messages[length:]
+        result = {
+            "phase": "cancelled",
+            "success": False,
+            "cancelled": True,
+            "error": "Turn cancelled",
+            "discarded_tokens": discarded_tokens,
+            "cancelled_calls": cancelled_calls
+        }
+        if on_discard:
+            on_discard(result)
+        return result
+
+    def get_collective_response(self,
+                                user_input: str,
+                                cancel_token: Optional[CancellationToken] = None,
+                                on_discard: Optional[Callable[[Dict[str, Any]], None]] = None) -> Generator[Dict[str, Any], None, None]:
+        """Get coordinated responses from multiple agents, yielding intermediate results
+
+        If cancel_token is cancelled, in-flight calls are aborted, remaining
+        calls are skipped, messages added during the turn are removed and a
+        final "cancelled" phase is yielded. The same rollback happens if the
+        generator is closed before the turn completes. on_discard receives
+        the cancellation summary in both cases.
+        """
         if not self.coordinator:
             yield {
                 "success": False,
@@ -124,110 +207,146 @@ class AgentGroup:
             }
             return
 
-        # Get task analysis from coordinator
-        self.coordinator.start_processing()
-        analysis = self.coordinator.analyze_task(user_input, self.api)
-        coordinator_time = self.coordinator.end_processing()
-
-        if not analysis["success"]:
-            yield {
-                **analysis,
-                "coordinator_time": coordinator_time
-            }
-            return
-
-        # Yield coordinator results first
-        yield {
-            "phase": "coordinator",
-            "success": True,
-            "analysis": analysis["analysis"],
-            "coordinator_time": coordinator_time
-        }
-
-        responses = []
+        history_lengths = self._history_lengths()
+        # Coordinator analysis, one call per agent, then the final evaluation
+        remaining_calls = len(self.agents) + 2
         total_tokens = 0
-        agent_times = {}
-
-        # Get responses from selected agents
-        for agent_name, agent in self.agents.items():
-            agent.start_processing()
-            agent.add_message("user", user_input)
-            response = self.get_response(agent_name)
-            process_time = agent.end_processing()
-
-            if response["success"]:
-                agent_response = {
-                    "agent": agent_name,
-                    "response": response["response"],
-                    "time": process_time
-                }
-                responses.append(agent_response)
-                total_tokens += response["tokens"]
-                agent_times[agent_name] = process_time
 
-                # Yield intermediate result after each agent
+        settled = False
+        try:
+            # Get task analysis from coordinator
+            self.coordinator.start_processing()
+            analysis = self.coordinator.analyze_task(user_input, self.api, cancel_token)
+            coordinator_time = self.coordinator.end_processing()
+
+            if analysis.get("cancelled"):
+                settled = True
+                yield self._discard_turn(history_lengths, 0, remaining_calls, on_discard)
+                return
+            remaining_calls -= 1
+            total_tokens += analysis.get("tokens", 0)
+
+            if not analysis["success"]:
+                settled = True
                 yield {
-                    "phase": "agent_response",
-                    "success": True,
-                    "current_agent": agent_name,
-                    "agent_response": agent_response,
-                    "responses": responses,
-                    "tokens": total_tokens,
-                    "coordinator_analysis": analysis["analysis"],
-                    "coordinator_time": coordinator_time,
-                    "agent_times": agent_times,
-                    "time": max(agent_times.values()) if agent_times else coordinator_time
+                    **analysis,
+                    "coordinator_time": coordinator_time
                 }
+                return
 
-        try:
-            # Get final evaluation from coordinator
-            final_evaluation_prompt = f"""Here are all agent responses for the user input: {user_input}
-
-            Agent responses:
-            {json.dumps(responses, indent=2)}
-
-            Please provide a final evaluation and synthesis of these responses.
-            If the user is requesting code, you MUST include the final, optimized code implementation after your analysis.
-            Your response should follow this format:
-
-            1. Analysis: A clear, concise summary of the different approaches and their pros/cons
-            2. Final Implementation: If code was requested, provide the complete, optimized code that combines the best aspects of all responses
-            
-            Make sure to include actual code, not just descriptions of what the code should do."""
+            # Yield coordinator results first
+            yield {
+                "phase": "coordinator",
+                "success": True,
+                "analysis": analysis["analysis"],
+                "coordinator_time": coordinator_time
+            }
 
-            self.coordinator.add_message("user", final_evaluation_prompt)
-            final_eval = self.api.generate_completion(
-                model=self.coordinator.model,
-                messages=self.coordinator.get_messages()
-            )
+            responses = []
+            agent_times = {}
+
+            # Get responses from selected agents
+            for agent_name, agent in self.agents.items():
+                if cancel_token and cancel_token.cancelled:
+                    settled = True
+                    yield self._discard_turn(history_lengths, total_tokens, remaining_calls, on_discard)
+                    return
+
+                agent.start_processing()
+                agent.add_message("user", user_input)
+                response = self.get_response(agent_name, cancel_token)
+                process_time = agent.end_processing()
+
+                if response.get("cancelled"):
+                    settled = True
+                    yield self._discard_turn(history_lengths, total_tokens, remaining_calls, on_discard)
+                    return
+                remaining_calls -= 1
+
+                if response["success"]:
+                    agent_response = {
+                        "agent": agent_name,
+                        "response": response["response"],
+                        "time": process_time
+                    }
+                    responses.append(agent_response)
+                    total_tokens += response["tokens"]
+                    agent_times[agent_name] = process_time
+
+                    # Yield intermediate result after each agent
+                    yield {
+                        "phase": "agent_response",
+                        "success": True,
+                        "current_agent": agent_name,
+                        "agent_response": agent_response,
+                        "responses": responses,
+                        "tokens": total_tokens,
+                        "coordinator_analysis": analysis["analysis"],
+                        "coordinator_time": coordinator_time,
+                        "agent_times": agent_times,
+                        "time": max(agent_times.values()) if agent_times else coordinator_time
+                    }
 
-            if final_eval["success"]:
-                # Yield final complete result with coordinator's evaluation
-                yield {
-                    "phase": "complete",
-                    "success": True,
-                    "responses": responses,
-                    "coordinator_analysis": analysis["analysis"],
-                    "final_evaluation": final_eval["response"],
-                    "tokens": total_tokens + final_eval.get("tokens", 0),
-                    "coordinator_time": coordinator_time,
-                    "agent_times": agent_times,
-                    "time": max(agent_times.values()) if agent_times else coordinator_time
-                }
-            else:
+            try:
+                # Get final evaluation from coordinator
+                final_evaluation_prompt = f"""Here are all agent responses for the user input: {user_input}
+
+                Agent responses:
+                {json.dumps(responses, indent=2)}
+
+                Please provide a final evaluation and synthesis of these responses.
+                If the user is requesting code, you MUST include the final, optimized code implementation after your analysis.
+                Your response should follow this format:
+
+                1. Analysis: A clear, concise summary of the different approaches and their pros/cons
+                2. Final Implementation: If code was requested, provide the complete, optimized code that combines the best aspects of all responses
+                
+                Make sure to include actual code, not just descriptions of what the code should do."""
+
+                self.coordinator.add_message("user", final_evaluation_prompt)
+                final_eval = self.api.generate_completion(
+                    model=self.coordinator.model,
+                    messages=self.coordinator.get_messages(),
+                    cancel_token=cancel_token,
+                    provider=self.coordinator.provider
+                )
+
+                settled = True
+                if final_eval.get("cancelled"):
+                    yield self._discard_turn(history_lengths, total_tokens, remaining_calls, on_discard)
+                elif final_eval["success"]:
+                    # Yield final complete result with coordinator's evaluation
+                    yield {
+                        "phase": "complete",
+                        "success": True,
+                        "responses": responses,
+                        "coordinator_analysis": analysis["analysis"],
+                        "final_evaluation": final_eval["response"],
+                        "tokens": total_tokens + final_eval.get("tokens", 0),
+                        "coordinator_time": coordinator_time,
+                        "agent_times": agent_times,
+                        "time": max(agent_times.values()) if agent_times else coordinator_time
+                    }
+                else:
+                    yield {
+                        "phase": "complete",
+                        "success": False,
+                        "error": f"Final evaluation failed: {final_eval.get('error', 'Unknown error')}",
+                        "responses": responses
+                    }
+            except Exception as e:
+                settled = True
                 yield {
                     "phase": "complete",
                     "success": False,
-                    "error": f"Final evaluation failed: {final_eval.get('error', 'Unknown error')}",
+                    "error": f"Error in final evaluation: {str(e)}",
                     "responses": responses
                 }
-        except Exception as e:
-            yield {
-                "phase": "complete",
-                "success": False,
-                "error": f"Error in final evaluation: {str(e)}",
-                "responses": responses
-            }
+        except GeneratorExit:
+            # The consumer stopped iterating mid-turn, e.g. on a Streamlit rerun
+            if not settled:
+                self._discard_turn(history_lengths, total_tokens, remaining_calls, on_discard)
+            raise
 
     def get_agents(self) -> Dict[str, Agent]:
         return self.agents
\ No newline at end of file
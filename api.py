@@ -1,71 +1,242 @@
+import json
 import requests
+import socket
 import time
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from cassette import Cassette
+from cancellation import CancellationToken, cancelled_result
 
-class OpenRouterAPI:
-    def __init__(self, api_key: str):
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+def request_error(e: Exception) -> Dict[str, Any]:
+    """Error result for a failed request, flagging connection errors,
+    timeouts and 5xx responses as transient"""
+    status_code = getattr(getattr(e, "response", None), "status_code", None)
+    result = {
+        "success": False,
+        "error": str(e)
+    }
+    if isinstance(e, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)) \
+            or (status_code is not None and status_code >= 500):
+        result["transient"] = True
+    return result
+
+class CancellableAdapter(HTTPAdapter):
+    """Transport adapter that shuts down its sockets when a token is cancelled.
+
+    Closing a session from another thread does not interrupt a request that
+    is blocked reading from the server; shutting down the socket does.
+    """
+
+    def __init__(self, cancel_token: CancellationToken):
+        self.cancel_token = cancel_token
+        self.unregister_callbacks = []
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        def cancellable(connection_cls):
+            class CancellableConnection(connection_cls):
+                def connect(self):
+                    super().connect()
+                    adapter.watch_socket(self.sock)
+            return CancellableConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("CancellableHTTPConnectionPool", (HTTPConnectionPool,),
+                         {"ConnectionCls": cancellable(HTTPConnection)}),
+            "https": type("CancellableHTTPSConnectionPool", (HTTPSConnectionPool,),
+                          {"ConnectionCls": cancellable(HTTPSConnection)})
+        }
+
+    def watch_socket(self, sock):
+        def shutdown():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.unregister_callbacks.append(self.cancel_token.on_cancel(shutdown))
+
+    def close(self):
+        for unregister in self.unregister_callbacks:
+            unregister()
+        self.unregister_callbacks = []
+        super().close()
+
+class OpenAICompatibleAPI:
+    """Client for any server implementing the OpenAI chat completions API,
+    such as OpenRouter, a llama.cpp server or vLLM"""
+
+    def __init__(self,
+                 base_url: str,
+                 api_key: Optional[str] = None,
+                 cassette: Optional[Cassette] = None):
         self.api_key = api_key
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.cassette = cassette
+        self.base_url = base_url.rstrip("/")
         self.headers = {
-            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
-            "HTTP_REFERER": "https://github.com/BTankut/AutogenAssistant",
-            "X-Title": "AutogenAssistant",
             "User-Agent": "AutogenAssistant/1.0.0",
             "Accept": "application/json"
         }
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
 
     def generate_completion(self, 
                           model: str, 
                           messages: list, 
-                          temperature: float = 0.7) -> Dict[str, Any]:
+                          temperature: float = 0.7,
+                          cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
-        Generate completion using OpenRouter API
+        Generate completion using the chat completions endpoint
         """
-        url = f"{self.base_url}/chat/completions"
-        
+        if cancel_token and cancel_token.cancelled:
+            return cancelled_result()
+
         payload = {
             "model": model,
             "messages": messages,
             "temperature": temperature
         }
 
+        if self.cassette and self.cassette.mode == "replay":
+            return self.cassette.replay("chat/completions", payload, cancel_token=cancel_token)
+
+        start_time = time.time()
+        result, chunks = self._post_completion(payload, cancel_token)
+        # Transient failures would otherwise replay forever
+        if self.cassette and not result.get("cancelled") and not result.get("transient"):
+            self.cassette.record("chat/completions", payload, result, time.time() - start_time, chunks)
+        return result
+
+    def _post_completion(self,
+                         payload: Dict[str, Any],
+                         cancel_token: Optional[CancellationToken] = None) -> Tuple[Dict[str, Any], List[tuple]]:
+        """Return the completion result and its streamed (offset, delta) chunks"""
+        url = f"{self.base_url}/chat/completions"
+
+        # A private session lets cancellation shut down this request's socket
+        session = requests.Session()
+        if cancel_token:
+            adapter = CancellableAdapter(cancel_token)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+        # Streaming lets an aborted turn stop generation mid-response
+        stream_payload = {
+            **payload,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+
         start_time = time.time()
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = session.post(url, headers=self.headers, json=stream_payload, stream=True)
             response.raise_for_status()
-            completion_time = time.time() - start_time
-            
-            result = response.json()
-            if "choices" not in result or not result["choices"]:
+
+            if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                # Servers without streaming support answer with a single JSON body
+                return self._parse_completion(response.json(), time.time() - start_time), []
+            return self._read_stream(response, start_time, cancel_token)
+        except Exception as e:
+            if cancel_token and cancel_token.cancelled:
+                return cancelled_result(), []
+            return request_error(e), []
+        finally:
+            session.close()
+
+    def _read_stream(self,
+                     response: requests.Response,
+                     start_time: float,
+                     cancel_token: Optional[CancellationToken] = None) -> Tuple[Dict[str, Any], List[tuple]]:
+        """Collect a server-sent events completion, checking for cancellation between chunks.
+
+        Returns the result and each content delta with its offset from start_time.
+        """
+        chunks = []
+        tokens = 0
+        has_choices = False
+        # chunk_size=None yields each chunk as it arrives instead of waiting for 512 bytes
+        for line in response.iter_lines(chunk_size=None):
+            if cancel_token and cancel_token.cancelled:
+                return cancelled_result(), chunks
+            # Blank lines separate events; lines starting with ":" are keep-alive comments
+            if not line.startswith(b"data:"):
+                continue
+            data = line[len(b"data:"):].strip()
+            if data == b"[DONE]":
+                break
+
+            chunk = json.loads(data)
+            if "error" in chunk:
+                error = chunk["error"]
                 return {
                     "success": False,
-                    "error": "Invalid API response: missing choices",
-                    "raw_response": result
-                }
-            if "usage" not in result:
-                return {
-                    "success": True,
-                    "response": result["choices"][0]["message"]["content"],
-                    "tokens": 0,
-                    "time": completion_time
-                }
+                    "error": error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                }, chunks
+            for choice in chunk.get("choices") or []:
+                has_choices = True
+                delta = choice.get("delta") or {}
+                if delta.get("content"):
+                    chunks.append((time.time() - start_time, delta["content"]))
+            if chunk.get("usage"):
+                tokens = chunk["usage"].get("total_tokens", 0)
+
+        if cancel_token and cancel_token.cancelled:
+            return cancelled_result(), chunks
+        if not has_choices:
+            return {
+                "success": False,
+                "error": "Invalid API response: missing choices"
+            }, chunks
+        return {
+            "success": True,
+            "response": "".join(delta for _, delta in chunks),
+            "tokens": tokens,
+            "time": time.time() - start_time
+        }, chunks
+
+    def _parse_completion(self, result: Dict[str, Any], completion_time: float) -> Dict[str, Any]:
+        if "choices" not in result or not result["choices"]:
+            return {
+                "success": False,
+                "error": "Invalid API response: missing choices",
+                "raw_response": result
+            }
+        if "usage" not in result:
             return {
                 "success": True,
                 "response": result["choices"][0]["message"]["content"],
-                "tokens": result["usage"]["total_tokens"],
+                "tokens": 0,
                 "time": completion_time
             }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        return {
+            "success": True,
+            "response": result["choices"][0]["message"]["content"],
+            "tokens": result["usage"]["total_tokens"],
+            "time": completion_time
+        }
 
     def get_models(self) -> Dict[str, Any]:
         """
-        Get available models from OpenRouter
+        Get available models from the server
         """
+        if self.cassette and self.cassette.mode == "replay":
+            return self.cassette.replay("models", {})
+
+        start_time = time.time()
+        result = self._fetch_models()
+        # The listing is fetched on every rerun; one recording is enough
+        if self.cassette and not result.get("transient") and not self.cassette.has_recording("models", {}):
+            self.cassette.record("models", {}, result, time.time() - start_time)
+        return result
+
+    def _fetch_models(self) -> Dict[str, Any]:
         url = f"{self.base_url}/models"
         try:
             response = requests.get(url, headers=self.headers)
@@ -75,7 +246,27 @@ class OpenRouterAPI:
                 "models": response.json()["data"]
             }
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return request_error(e)
+
+    def health_check(self, timeout: float = 5.0) -> bool:
+        """
+        Check that the server answers its model listing
+        """
+        if self.cassette and self.cassette.mode == "replay":
+            return True
+        try:
+            response = requests.get(f"{self.base_url}/models", headers=self.headers, timeout=timeout)
+            return response.ok
+        except Exception:
+            return False
+
+class OpenRouterAPI(OpenAICompatibleAPI):
+    def __init__(self,
+                 api_key: str,
+                 cassette: Optional[Cassette] = None,
+                 base_url: str = OPENROUTER_BASE_URL):
+        super().__init__(base_url, api_key, cassette)
+        self.headers.update({
+            "HTTP_REFERER": "https://github.com/BTankut/AutogenAssistant",
+            "X-Title": "AutogenAssistant"
+        })
@@ -0,0 +1,55 @@
+import threading
+from typing import Callable, Dict, Any
+
+class CancellationToken:
+    """Cooperative cancellation signal shared by everything working on one turn.
+
+    Callbacks registered with on_cancel run once, on the thread that calls
+    cancel(); they are used to close connections that are blocked on I/O.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register a callback and return a function that unregisters it"""
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Sleep until cancelled or timed out; returns True if cancelled"""
+        return self.event.wait(timeout)
+
+def cancelled_result() -> Dict[str, Any]:
+    return {
+        "success": False,
+        "cancelled": True,
+        "error": "Request cancelled"
+    }
@@ -0,0 +1,14 @@
+import hashlib
+import json
+from typing import Any
+
+def canonical_key(value: Any) -> str:
+    """sha256 of the canonical JSON form of value, so equal requests share a key
+    regardless of dict ordering"""
+    canonical = json.dumps(
+        value,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+from cancellation import cancelled_result
+from canonical import canonical_key
+
+class Cassette:
+    """Record and replay OpenRouter API traffic from a JSON Lines file.
+
+    Each line holds one interaction: the request key, endpoint, elapsed
+    time, the result dict returned to the caller and, for streamed
+    completions, each content delta with its offset from the start of the
+    request. On load the lines are
+    indexed by request key, so replay lookups are O(1). Identical requests
+    recorded more than once are replayed in recording order.
+    """
+
+    MODES = ("record", "replay")
+
+    def __init__(self, path: str, mode: str = "replay", realtime: bool = False):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.index: Dict[str, List[Dict[str, Any]]] = {}
+        self.cursors: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+        """Canonical hash of an endpoint and its request payload"""
+        return canonical_key({"endpoint": endpoint, "payload": payload})
+
+    def load(self):
+        """Build the request index from the cassette file, if it exists"""
+        self.index = {}
+        self.cursors = {}
+        if not os.path.exists(self.path):
+            if self.mode == "replay":
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self.index.setdefault(entry["key"], []).append(entry)
+
+    def record(self,
+               endpoint: str,
+               payload: Dict[str, Any],
+               result: Dict[str, Any],
+               elapsed: float,
+               chunks: Optional[List[tuple]] = None):
+        """Append an interaction to the cassette file and the index.
+
+        chunks is a list of (offset, delta) pairs for a streamed response.
+        """
+        entry = {
+            "key": self.make_key(endpoint, payload),
+            "endpoint": endpoint,
+            "elapsed": round(elapsed, 4),
+            "result": result
+        }
+        if chunks:
+            entry["chunks"] = [[round(offset, 4), delta] for offset, delta in chunks]
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.index.setdefault(entry["key"], []).append(entry)
+
+    def has_recording(self, endpoint: str, payload: Dict[str, Any]) -> bool:
+        with self.lock:
+            return self.make_key(endpoint, payload) in self.index
+
+    def replay(self,
+               endpoint: str,
+               payload: Dict[str, Any],
+               cancel_token=None,
+               on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Return the recorded result for a request, optionally at recorded speed.
+
+        Recorded stream chunks are passed to on_chunk; in realtime mode each
+        one is delivered at its recorded offset.
+        """
+        key = self.make_key(endpoint, payload)
+        with self.lock:
+            entries = self.index.get(key)
+            if not entries:
+                entry = None
+            else:
+                cursor = self.cursors.get(key, 0)
+                # Repeat the last recording once all of them have been used
+                entry = entries[min(cursor, len(entries) - 1)]
+                self.cursors[key] = cursor + 1
+
+        if entry is None:
+            return {
+                "success": False,
+                "error": f"No recorded response for {endpoint} request in cassette {self.path}"
+            }
+
+        start_time = time.time()
+        for offset, delta in entry.get("chunks", []):
+            if self.realtime and self._wait_until(start_time + offset, cancel_token):
+                return cancelled_result()
+            if on_chunk:
+                on_chunk(delta)
+        if self.realtime and self._wait_until(start_time + entry["elapsed"], cancel_token):
+            return cancelled_result()
+        return dict(entry["result"])
+
+    @staticmethod
+    def _wait_until(deadline: float, cancel_token=None) -> bool:
+        """Sleep until deadline; returns True if cancelled first"""
+        remaining = max(0.0, deadline - time.time())
+        if cancel_token:
+            return cancel_token.wait(remaining)
+        time.sleep(remaining)
+        return False
+
+    def rewind(self):
+        """Restart replay from the first recording of every request"""
+        with self.lock:
+            self.cursors = {}
+
+def cassette_from_env() -> Optional[Cassette]:
+    """Create a cassette from OPENROUTER_CASSETTE and OPENROUTER_CASSETTE_MODE.
+
+    OPENROUTER_CASSETTE_MODE is one of "record", "replay" (recorded speed)
+    or "replay-fast" (no delays). Returns None when no cassette is configured.
+    """
+    path = os.getenv("OPENROUTER_CASSETTE")
+    if not path:
+        return None
+    mode = os.getenv("OPENROUTER_CASSETTE_MODE", "replay")
+    if mode == "replay-fast":
+        return Cassette(path, mode="replay", realtime=False)
+    return Cassette(path, mode=mode, realtime=(mode == "replay"))
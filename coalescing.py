@@ -0,0 +1,138 @@
+import threading
+from typing import Dict, Any, Optional
+from cancellation import CancellationToken, cancelled_result
+from canonical import canonical_key
+
+class InFlightRequest:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+        self.wake_events = []
+        # Cancelled only once every waiter has gone away
+        self.cancel_token = CancellationToken()
+
+class CoalescingAPI:
+    """Share one upstream request between concurrent identical completions.
+
+    In-flight requests are keyed by a canonical hash of (model, messages,
+    temperature). The first caller starts the upstream request on a worker
+    thread; every caller, including the first, waits for it and receives
+    its own copy of the result. A cancelled waiter detaches immediately;
+    the upstream request is cancelled only when no waiters remain.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.in_flight: Dict[str, InFlightRequest] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "upstream_requests": 0,
+            "coalesced_requests": 0,
+            "cancelled_waiters": 0,
+            "cancelled_upstream_requests": 0
+        }
+
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float) -> str:
+        """Canonical hash of a completion request"""
+        return canonical_key({"model": model, "messages": messages, "temperature": temperature})
+
+    def generate_completion(self,
+                          model: str,
+                          messages: list,
+                          temperature: float = 0.7,
+                          cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Generate completion, joining an identical request already in flight
+        """
+        if cancel_token and cancel_token.cancelled:
+            return cancelled_result()
+
+        # Snapshot the messages so callers can keep appending to their history
+        messages = [dict(message) for message in messages]
+        key = self.make_key(model, messages, temperature)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            flight = self.in_flight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = InFlightRequest()
+                self.in_flight[key] = flight
+                self.stats["upstream_requests"] += 1
+            else:
+                self.stats["coalesced_requests"] += 1
+            flight.waiters += 1
+            wake = threading.Event()
+            flight.wake_events.append(wake)
+
+        if is_leader:
+            worker = threading.Thread(
+                target=self._run,
+                args=(key, flight, model, messages, temperature),
+                daemon=True
+            )
+            worker.start()
+
+        unregister = cancel_token.on_cancel(wake.set) if cancel_token else None
+        wake.wait()
+        if unregister:
+            unregister()
+
+        with self.lock:
+            flight.waiters -= 1
+            flight.wake_events.remove(wake)
+            if flight.done.is_set():
+                return dict(flight.result)
+
+            self.stats["cancelled_waiters"] += 1
+            abandoned = flight.waiters == 0
+            if abandoned:
+                self.stats["cancelled_upstream_requests"] += 1
+                # New identical requests must not join a flight being cancelled
+                if self.in_flight.get(key) is flight:
+                    del self.in_flight[key]
+
+        if abandoned:
+            flight.cancel_token.cancel()
+        return cancelled_result()
+
+    def _run(self, key: str, flight: InFlightRequest, model: str, messages: list, temperature: float):
+        try:
+            result = self.api.generate_completion(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                cancel_token=flight.cancel_token
+            )
+        except Exception as e:
+            result = {
+                "success": False,
+                "error": str(e)
+            }
+
+        with self.lock:
+            # Later identical requests start a fresh upstream call
+            if self.in_flight.get(key) is flight:
+                del self.in_flight[key]
+            flight.result = result
+            flight.done.set()
+            for wake in flight.wake_events:
+                wake.set()
+
+    def get_models(self) -> Dict[str, Any]:
+        return self.api.get_models()
+
+    def health_check(self) -> bool:
+        return self.api.health_check()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request counts and the share of requests served by coalescing"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["coalescing_ratio"] = (
+            stats["coalesced_requests"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
@@ -1,4 +1,8 @@
 import streamlit as st
+from utils import IncrementalRenderer, format_history_entry
+
+# Most recent history entries rendered in full; older ones are placeholders
+EXPANDED_HISTORY_ENTRIES = 5
 
 # Default agent roles
 DEFAULT_AGENT_ROLES = {
@@ -42,12 +46,19 @@ def init_session_state():
         st.session_state.metrics = {
             'total_tokens': 0,
             'response_times': [],
-            'model_usage': {}
+            'model_usage': {},
+            'cancelled_turns': 0,
+            'cancelled_calls': 0,
+            'discarded_tokens': 0
         }
     if 'available_models' not in st.session_state:
         st.session_state.available_models = {}
     if 'coordinator' not in st.session_state:
         st.session_state.coordinator = None
+    if 'turn_token' not in st.session_state:
+        st.session_state.turn_token = None
+    if 'history_renderer' not in st.session_state:
+        st.session_state.history_renderer = IncrementalRenderer(format_history_entry)
 
     # Remember selected models for each role
     if 'selected_models' not in st.session_state:
@@ -0,0 +1,584 @@
+"""Multi-session load test for the Streamlit app.
+
+Starts one `streamlit run main.py` server against a mock OpenAI-compatible
+backend (stub_server.py) and drives N concurrent client sessions at it over
+Streamlit's websocket protocol, stepping each session through coordinator
+setup, agent creation and collective sends. All sessions share the server's
+process, its cached provider router and request coalescing, as real users
+do. Measures rerun latency, time to first render, growth of each session's
+st.session_state, the server's CPU and memory (after one warm-up session
+has loaded the app) and the coalescing stats, and writes a JSON report
+that can be compared between runs:
+
+    python loadtest.py --sessions 20 --sends 5 --report run.json
+    python loadtest.py --sessions 20 --sends 5 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+from config import DEFAULT_AGENT_ROLES
+from stub_server import start_stub_server, STUB_MODELS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "main.py")
+AGENT_ROLES = ["user_proxy", "coder", "critic"]
+COLLECTIVE_MODE = "Collective (Coordinated)"
+
+def deep_sizeof(obj, seen=None) -> int:
+    """Approximate memory held by an object graph, counting shared objects once"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+def measure_session_state(state) -> Dict[str, int]:
+    """Bytes held by the growing parts of one session's state"""
+    sizes = {
+        "conversations": deep_sizeof(state["conversations"]) if "conversations" in state else 0,
+        "metrics": deep_sizeof(state["metrics"]) if "metrics" in state else 0,
+        "rendered_history": deep_sizeof(state["history_renderer"].rendered) if "history_renderer" in state else 0,
+        "agent_histories": 0
+    }
+    if "agent_group" in state:
+        group = state["agent_group"]
+        agents = list(group.agents.values())
+        if group.coordinator:
+            agents.append(group.coordinator)
+        sizes["agent_histories"] = sum(deep_sizeof(agent.messages) for agent in agents)
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+def current_rss_kb() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # No procfs: fall back to the peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class ProbeHandler(BaseHTTPRequestHandler):
+    """Reports the state of the Streamlit server it runs inside.
+
+    GET /process returns the server's CPU time and memory; GET
+    /session/<id> returns the session's state sizes and the coalescing
+    stats of its provider router. CPU spent answering probes is subtracted
+    from the reported CPU time.
+    """
+
+    probe_cpu_seconds = 0.0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cpu_start = time.thread_time()
+        if self.path == "/process":
+            body = self._process()
+        elif self.path.startswith("/session/"):
+            body = self._session(self.path[len("/session/"):])
+        else:
+            body = {"error": f"Unknown path: {self.path}"}
+        with ProbeHandler.lock:
+            ProbeHandler.probe_cpu_seconds += time.thread_time() - cpu_start
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _process(self) -> Dict[str, Any]:
+        times = os.times()
+        with ProbeHandler.lock:
+            probe_cpu = ProbeHandler.probe_cpu_seconds
+        return {
+            "cpu_seconds": times.user + times.system - probe_cpu,
+            "rss_kb": current_rss_kb()
+        }
+
+    def _session(self, session_id: str) -> Dict[str, Any]:
+        from streamlit.runtime import Runtime
+        from coalescing import CoalescingAPI
+
+        # The runtime has no public way to look up another session's state
+        session_info = Runtime.instance()._session_mgr.get_active_session_info(session_id)
+        if session_info is None:
+            return {"error": f"Unknown session: {session_id}"}
+        state = session_info.session.session_state
+
+        body = {"session_state_bytes": measure_session_state(state)}
+        if "agent_group" in state:
+            router = state["agent_group"].api
+            body["providers"] = router.get_stats()
+            body["coalescing"] = {
+                name: api.get_stats()
+                for name, api in router.providers.items()
+                if isinstance(api, CoalescingAPI)
+            }
+        return body
+
+def serve(port: int, probe_port: int):
+    """Run main.py with `streamlit run` plus the probe; runs in the server process"""
+    probe = ThreadingHTTPServer(("127.0.0.1", probe_port), ProbeHandler)
+    probe.daemon_threads = True
+    threading.Thread(target=probe.serve_forever, daemon=True).start()
+
+    from streamlit.web import cli
+    cli.main([
+        "run", APP_PATH,
+        "--server.address", "127.0.0.1",
+        "--server.port", str(port),
+        "--server.headless", "true",
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+        "--logger.level", "error"
+    ], standalone_mode=False)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class AppServer:
+    """One `streamlit run main.py` process serving every simulated session"""
+
+    def __init__(self, backend_url: str, timeout: float):
+        self.port = free_port()
+        self.probe_port = free_port()
+        # main.py reads and rewrites model selections in its working directory
+        self.work_dir = tempfile.mkdtemp(prefix="loadtest-server-")
+        with open(os.path.join(self.work_dir, ".model_selections.json"), "w") as f:
+            json.dump({role: STUB_MODELS[0] for role in ["coordinator"] + AGENT_ROLES}, f)
+        self.log_path = os.path.join(self.work_dir, "server.log")
+
+        env = {
+            **os.environ,
+            "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY") or "loadtest",
+            "OPENROUTER_BASE_URL": backend_url,
+            "PYTHONPATH": os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")]))
+        }
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                [sys.executable, "-c", f"import loadtest; loadtest.serve({self.port}, {self.probe_port})"],
+                cwd=self.work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        self._wait_until_ready(timeout)
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def _wait_until_ready(self, timeout: float):
+        import requests
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        with open(self.log_path, "r") as log:
+            output = log.read()
+        self.stop()
+        raise RuntimeError(f"Streamlit server did not start:\n{output}")
+
+    async def probe(self, path: str) -> Dict[str, Any]:
+        from tornado.httpclient import AsyncHTTPClient
+
+        response = await AsyncHTTPClient().fetch(f"http://127.0.0.1:{self.probe_port}{path}")
+        return json.loads(response.body)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+class ClientSession:
+    """A browser session speaking Streamlit's websocket protocol.
+
+    Keeps the elements of the last script run by delta path, and sends the
+    values of every widget it has set with each rerun, like the frontend.
+    """
+
+    def __init__(self, index: int, server: AppServer, timeout: float):
+        self.index = index
+        self.server = server
+        self.timeout = timeout
+        self.connection = None
+        self.session_id = None
+        self.elements = {}
+        self.message_cache = {}
+        self.widget_states = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.memory_by_step: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self.last_probe = {}
+        self.last_probe_time = 0.0
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+        self.connection = await websocket_connect(self.server.url, subprotocols=["streamlit"])
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+
+    async def _run(self, phase: str, trigger: Optional[str] = None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        back_msg.rerun_script.page_script_hash = ""
+        back_msg.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        if trigger:
+            trigger_state = back_msg.rerun_script.widget_states.widgets.add()
+            trigger_state.id = trigger
+            trigger_state.trigger_value = True
+
+        start_time = time.perf_counter()
+        await self.connection.write_message(back_msg.SerializeToString(), binary=True)
+        while True:
+            data = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+            if data is None:
+                self.errors.append(f"{phase}: connection closed")
+                return
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "ref_hash":
+                cached = ForwardMsg()
+                cached.CopyFrom(self.message_cache[msg.ref_hash])
+                cached.metadata.CopyFrom(msg.metadata)
+                msg, kind = cached, cached.WhichOneof("type")
+            elif msg.metadata.cacheable:
+                self.message_cache[msg.hash] = msg
+
+            if kind == "new_session":
+                # Every script run starts from an empty page
+                self.elements = {}
+                if msg.new_session.HasField("initialize"):
+                    self.session_id = msg.new_session.initialize.session_id
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                self.elements[tuple(msg.metadata.delta_path)] = msg.delta.new_element
+            elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.latencies.setdefault(phase, []).append(time.perf_counter() - start_time)
+
+        for element in self.elements.values():
+            element_type = element.WhichOneof("type")
+            if element_type == "exception":
+                self.errors.append(f"{phase}: {element.exception.message}")
+            elif element_type == "alert" and element.alert.format == element.alert.ERROR:
+                self.errors.append(f"{phase}: {element.alert.body}")
+
+    async def record(self, phase: str):
+        """Measure this session's state on the server after a step"""
+        self.last_probe = await self.server.probe(f"/session/{self.session_id}")
+        self.last_probe_time = time.perf_counter()
+        memory = self.last_probe.get("session_state_bytes", {"total": 0})
+        self.memory_by_step.append({"phase": phase, **memory})
+
+    def _widget(self, phase: str, kind: str, label: str):
+        """Find a widget by label, recording an error if the page lacks it"""
+        for element in self.elements.values():
+            if element.WhichOneof("type") == kind and getattr(element, kind).label == label:
+                return getattr(element, kind)
+        self.errors.append(f"{phase}: no {kind} labelled {label!r}")
+        return None
+
+    def _set_option(self, phase: str, widget, option: str) -> bool:
+        """Select an option by its label, or by the name before a format_func's ": " """
+        options = list(widget.options)
+        matches = [index for index, label in enumerate(options) if label == option or label.startswith(f"{option}: ")]
+        if not matches:
+            self.errors.append(f"{phase}: no option {option!r} in {widget.label!r}")
+            return False
+        state = self.widget_states.setdefault(widget.id, self._widget_state(widget.id))
+        state.int_value = matches[0]
+        return True
+
+    def _set_text(self, widget, text: str):
+        state = self.widget_states.setdefault(widget.id, self._widget_state(widget.id))
+        state.string_value = text
+
+    @staticmethod
+    def _widget_state(widget_id: str):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        state = WidgetState()
+        state.id = widget_id
+        return state
+
+    async def first_render(self):
+        start_time = time.perf_counter()
+        await self.connect()
+        await self._run("first_render")
+        # Include the websocket handshake
+        self.latencies["first_render"][-1] = time.perf_counter() - start_time
+
+    async def setup_coordinator(self):
+        button = self._widget("setup_coordinator", "button", "Setup Coordinator")
+        if button:
+            await self._run("setup_coordinator", trigger=button.id)
+
+    async def add_agent(self, role: str):
+        role_select = self._widget("add_agent", "selectbox", "Role")
+        button = self._widget("add_agent", "button", "Add Agent")
+        if role_select and button and self._set_option("add_agent", role_select, DEFAULT_AGENT_ROLES[role]["name"]):
+            await self._run("add_agent", trigger=button.id)
+
+    async def send_collective(self, message: str):
+        # "Send to All" only appears after a rerun in collective mode
+        chat_mode = self._widget("collective_send", "radio", "Chat Mode")
+        if not chat_mode:
+            return
+        # The page reports the default; the selection lives in the client
+        selected = self.widget_states[chat_mode.id].int_value if chat_mode.id in self.widget_states else chat_mode.default
+        if chat_mode.options[selected] != COLLECTIVE_MODE:
+            if not self._set_option("collective_send", chat_mode, COLLECTIVE_MODE):
+                return
+            await self._run("select_chat_mode")
+
+        text_area = self._widget("collective_send", "text_area", "Your message")
+        button = self._widget("collective_send", "button", "Send to All")
+        if text_area and button:
+            self._set_text(text_area, message)
+            await self._run("collective_send", trigger=button.id)
+
+async def drive_session(session: ClientSession, args: argparse.Namespace):
+    """Step one session through the app, recording failures instead of raising"""
+    try:
+        await session.first_render()
+        await session.record("first_render")
+        await session.setup_coordinator()
+        await session.record("setup_coordinator")
+        for role in AGENT_ROLES[:args.agents]:
+            await session.add_agent(role)
+            await session.record("add_agent")
+        for send in range(args.sends):
+            prompt = args.prompt if args.shared_prompt else f"{args.prompt} (session {session.index})"
+            await session.send_collective(f"{prompt} #{send}")
+            await session.record("collective_send")
+    except Exception as e:
+        session.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        session.close()
+
+async def sample_server(server: AppServer, interval: float, samples: list, stopped: asyncio.Event):
+    start_time = time.perf_counter()
+    while not stopped.is_set():
+        process = await server.probe("/process")
+        samples.append({"time": time.perf_counter() - start_time, **process})
+        try:
+            await asyncio.wait_for(stopped.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_sessions(server: AppServer, args: argparse.Namespace) -> Dict[str, Any]:
+    # Load main.py's imports and caches first, so they don't count as per-session cost
+    warm_up = ClientSession(-1, server, args.timeout)
+    await warm_up.first_render()
+    warm_up.close()
+
+    sessions = [ClientSession(index, server, args.timeout) for index in range(args.sessions)]
+    samples = []
+    stopped = asyncio.Event()
+    before = await server.probe("/process")
+    sampler = asyncio.ensure_future(sample_server(server, args.sample_interval, samples, stopped))
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(drive_session(session, args) for session in sessions))
+    wall_time = time.perf_counter() - wall_start
+    after = await server.probe("/process")
+    stopped.set()
+    await sampler
+
+    return {"sessions": sessions, "before": before, "after": after, "wall_time": wall_time, "samples": samples}
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1]
+    }
+
+def run_load_test(args) -> Dict[str, Any]:
+    if args.backend_url:
+        backend_url = args.backend_url
+    else:
+        _, backend_url = start_stub_server(latency=args.backend_latency)
+
+    server = AppServer(backend_url, args.timeout)
+    try:
+        run = asyncio.run(run_sessions(server, args))
+    finally:
+        server.stop()
+    sessions, before, after, wall_time = run["sessions"], run["before"], run["after"], run["wall_time"]
+
+    latencies = {}
+    for session in sessions:
+        for phase, values in session.latencies.items():
+            latencies.setdefault(phase, []).extend(values)
+    reruns = sum(len(values) for values in latencies.values())
+    server_cpu = after["cpu_seconds"] - before["cpu_seconds"]
+
+    # Sessions run the same steps, so their measurements line up by step
+    memory_by_step = []
+    for step in zip(*(session.memory_by_step for session in sessions)):
+        totals = [memory["total"] for memory in step]
+        memory_by_step.append({"phase": step[0]["phase"], "mean_bytes": statistics.fmean(totals), "max_bytes": max(totals)})
+    final_memory = [session.memory_by_step[-1] for session in sessions if session.memory_by_step]
+    memory_keys = [key for key in final_memory[0] if key != "phase"] if final_memory else []
+
+    # The provider router is shared, so the latest measurement covers every session
+    last_probe = max(sessions, key=lambda session: session.last_probe_time).last_probe
+
+    samples = run["samples"]
+    sample_cores = [
+        (current["cpu_seconds"] - previous["cpu_seconds"]) / (current["time"] - previous["time"])
+        for previous, current in zip(samples, samples[1:])
+        if current["time"] > previous["time"]
+    ]
+
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "agents": args.agents,
+            "sends": args.sends,
+            "backend_latency": args.backend_latency,
+            "shared_prompt": args.shared_prompt
+        },
+        "rerun_latency": {phase: summarize(values) for phase, values in latencies.items()},
+        "time_to_first_render": summarize(latencies["first_render"]) if "first_render" in latencies else {},
+        "session_state_bytes": {
+            "by_step": memory_by_step,
+            "final_mean": {key: statistics.fmean(memory.get(key, 0) for memory in final_memory) for key in memory_keys},
+            "growth_per_send": (
+                (memory_by_step[-1]["mean_bytes"] - memory_by_step[-args.sends - 1]["mean_bytes"]) / args.sends
+                if args.sends and len(memory_by_step) > args.sends else 0.0
+            )
+        },
+        "cpu": {
+            # CPU of the Streamlit server process only; the mock backend and
+            # the simulated clients run in this process
+            "server_seconds": server_cpu,
+            "wall_seconds": wall_time,
+            "cores_used": server_cpu / wall_time if wall_time else 0.0,
+            "peak_cores": max(sample_cores, default=0.0),
+            "seconds_per_rerun": server_cpu / reruns if reruns else 0.0
+        },
+        "rss_kb": {
+            "before": before["rss_kb"],
+            "after": after["rss_kb"],
+            "peak": max(sample["rss_kb"] for sample in samples + [after]),
+            "per_session": (after["rss_kb"] - before["rss_kb"]) / args.sessions
+        },
+        "server_samples": samples,
+        "coalescing": last_probe.get("coalescing", {}),
+        "providers": last_probe.get("providers", {}),
+        "errors": [f"session {session.index}: {error}" for session in sessions for error in session.errors]
+    }
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    def delta(current: float, previous: float) -> str:
+        if not previous:
+            return ""
+        return f" ({(current - previous) / previous:+.1%})"
+
+    config = report["config"]
+    print(f"Sessions: {config['sessions']}  agents: {config['agents']}  sends: {config['sends']}")
+    print(f"{'phase':<20}{'count':>7}{'mean s':>10}{'p50 s':>10}{'p95 s':>10}{'max s':>10}")
+    for phase, stats in report["rerun_latency"].items():
+        previous = (baseline or {}).get("rerun_latency", {}).get(phase, {})
+        print(f"{phase:<20}{stats['count']:>7}{stats['mean']:>10.3f}{stats['p50']:>10.3f}"
+              f"{stats['p95']:>10.3f}{stats['max']:>10.3f}{delta(stats['p95'], previous.get('p95'))}")
+
+    memory = report["session_state_bytes"]
+    previous_memory = (baseline or {}).get("session_state_bytes", {})
+    if memory["final_mean"]:
+        print("Session state per session (bytes): " + ", ".join(
+            f"{key}={value:,.0f}" for key, value in memory["final_mean"].items()
+        ) + delta(memory["final_mean"]["total"], previous_memory.get("final_mean", {}).get("total")))
+    print(f"Growth per collective send: {memory['growth_per_send']:,.0f} bytes"
+          f"{delta(memory['growth_per_send'], previous_memory.get('growth_per_send'))}")
+
+    cpu = report["cpu"]
+    previous_cpu = (baseline or {}).get("cpu", {})
+    print(f"Server CPU: {cpu['server_seconds']:.2f}s over {cpu['wall_seconds']:.2f}s wall "
+          f"({cpu['cores_used']:.2f} cores, peak {cpu['peak_cores']:.2f}), "
+          f"{cpu['seconds_per_rerun'] * 1000:.1f} ms per rerun"
+          f"{delta(cpu['seconds_per_rerun'], previous_cpu.get('seconds_per_rerun'))}")
+    rss = report["rss_kb"]
+    print(f"Server RSS: {rss['before']:,} KB -> {rss['after']:,} KB (peak {rss['peak']:,} KB), "
+          f"{rss['per_session']:,.0f} KB per session"
+          f"{delta(rss['per_session'], (baseline or {}).get('rss_kb', {}).get('per_session'))}")
+    for provider, stats in report["coalescing"].items():
+        print(f"Coalescing ({provider}): {stats['requests']} requests, {stats['upstream_requests']} upstream, "
+              f"ratio {stats['coalescing_ratio']:.2f}")
+    if report["errors"]:
+        print(f"Errors ({len(report['errors'])}):")
+        for error in report["errors"][:10]:
+            print(f"  {error}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test main.py with simulated sessions")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of concurrent simulated sessions")
+    parser.add_argument("--agents", type=int, default=len(AGENT_ROLES), choices=range(1, len(AGENT_ROLES) + 1),
+                        help="Agents added per session")
+    parser.add_argument("--sends", type=int, default=3, help="Collective messages sent per session")
+    parser.add_argument("--prompt", default="Write a function that reverses a string")
+    parser.add_argument("--shared-prompt", action="store_true", help="Send the same prompt from every session")
+    parser.add_argument("--backend-latency", type=float, default=0.0, help="Seconds per mock completion")
+    parser.add_argument("--backend-url", help="Use an already running mock backend instead of starting one")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed per rerun")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between server CPU samples")
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    report = run_load_test(args)
+    print_report(report, baseline)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
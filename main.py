@@ -1,10 +1,17 @@
 import streamlit as st
 import json
-from config import DEFAULT_AGENT_ROLES, init_session_state
-from api import OpenRouterAPI
+from config import DEFAULT_AGENT_ROLES, EXPANDED_HISTORY_ENTRIES, init_session_state
+from api import OpenRouterAPI, OpenAICompatibleAPI, OPENROUTER_BASE_URL
+from cassette import cassette_from_env
+from coalescing import CoalescingAPI
+from cancellation import CancellationToken
+from providers import ProviderRouter, DEFAULT_PROVIDER
 from agents import Agent, CoordinatorAgent, AgentGroup
-from utils import format_conversation, create_metrics_charts, update_metrics
+from utils import (create_metrics_charts, update_metrics,
+                   update_cancellation_metrics, cancel_on_rerun)
 import os
+import threading
+import uuid
 
 # Page configuration
 st.set_page_config(
@@ -24,6 +31,71 @@ def handle_error(func):
             return None
     return wrapper
 
+# Recorded API traffic is shared by all sessions and loaded only once
+@st.cache_resource
+def load_cassette():
+    return cassette_from_env()
+
+# Provider backends are shared by all sessions, so identical requests from
+# concurrent sessions share one upstream call
+@st.cache_resource
+def load_router(api_key: str) -> ProviderRouter:
+    router = ProviderRouter()
+    router.add_provider(
+        DEFAULT_PROVIDER,
+        CoalescingAPI(OpenRouterAPI(
+            api_key,
+            cassette=load_cassette(),
+            base_url=os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL)
+        ))
+    )
+
+    # Optional local OpenAI-compatible server (llama.cpp, vLLM, stub_server.py)
+    local_base_url = os.getenv("LOCAL_LLM_BASE_URL")
+    if local_base_url:
+        fallback_model = os.getenv("LOCAL_LLM_FALLBACK_MODEL")
+        router.add_provider(
+            "local",
+            CoalescingAPI(OpenAICompatibleAPI(local_base_url, os.getenv("LOCAL_LLM_API_KEY"))),
+            fallback=DEFAULT_PROVIDER if fallback_model else None,
+            fallback_model=fallback_model
+        )
+    return router
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_provider_models(api_key: str, provider: str) -> dict:
+    models_response = load_router(api_key).get_models(provider)
+    if not models_response["success"]:
+        return {}
+    return {model["id"]: model["id"] for model in models_response["models"]}
+
+# Models offered for the selected provider
+def get_provider_models(provider: str) -> dict:
+    if provider == DEFAULT_PROVIDER:
+        return st.session_state.available_models
+    return load_provider_models(st.session_state.api_key, provider)
+
+def select_provider(router: ProviderRouter, key: str) -> str:
+    provider_names = router.get_provider_names()
+    if len(provider_names) == 1:
+        return DEFAULT_PROVIDER
+    return st.selectbox("Provider", provider_names, key=key)
+
+# Cancel the requests still running for the previous turn
+def start_turn() -> CancellationToken:
+    if st.session_state.turn_token:
+        st.session_state.turn_token.cancel()
+    st.session_state.turn_token = CancellationToken()
+    return st.session_state.turn_token
+
+# Sessions share the file, so replace it whole rather than rewriting it in
+# place, which lets another session read it half-written
+def save_model_selections(selected_models: dict):
+    temp_path = f".model_selections.json.{os.getpid()}.{threading.get_ident()}"
+    with open(temp_path, 'w') as f:
+        json.dump(selected_models, f)
+    os.replace(temp_path, '.model_selections.json')
+
 # Initialize session state
 init_session_state()
 
@@ -37,7 +109,7 @@ with st.sidebar:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if api_key:
         st.session_state.api_key = api_key
-        api = OpenRouterAPI(api_key)
+        api = load_router(api_key)
 
         # Fetch available models
         models_response = api.get_models()
@@ -69,19 +141,28 @@ with st.sidebar:
         if 'agent_group' not in st.session_state:
             st.session_state.agent_group = AgentGroup(api)
 
+        # Provider health, when more than one backend is configured
+        if len(api.get_provider_names()) > 1:
+            st.caption("Providers: " + ", ".join(
+                f"{name} {'✅' if api.is_healthy(name) else '❌'}"
+                for name in api.get_provider_names()
+            ))
+
         # Coordinator setup
         if not st.session_state.coordinator:
             st.subheader("Setup Coordinator")
-            if st.session_state.available_models:
+            coordinator_provider = select_provider(api, "coordinator_provider")
+            coordinator_models = get_provider_models(coordinator_provider)
+            if coordinator_models:
                 # Get saved coordinator model or default to first
                 default_coordinator_model = st.session_state.selected_models.get('coordinator')
                 default_index = 0
-                if default_coordinator_model in st.session_state.available_models:
-                    default_index = list(st.session_state.available_models.keys()).index(default_coordinator_model)
+                if default_coordinator_model in coordinator_models:
+                    default_index = list(coordinator_models.keys()).index(default_coordinator_model)
 
                 coordinator_model = st.selectbox(
                     "Coordinator Model",
-                    list(st.session_state.available_models.keys()),
+                    list(coordinator_models.keys()),
                     key="coordinator_model",
                     index=default_index
                 )
@@ -89,16 +170,16 @@ with st.sidebar:
                 if st.button("Setup Coordinator"):
                     coordinator = CoordinatorAgent(
                         name="Coordinator",
-                        model=st.session_state.available_models[coordinator_model],
-                        system_message=DEFAULT_AGENT_ROLES["coordinator"]["system_message"]
+                        model=coordinator_models[coordinator_model],
+                        system_message=DEFAULT_AGENT_ROLES["coordinator"]["system_message"],
+                        provider=coordinator_provider
                     )
                     st.session_state.agent_group.add_agent(coordinator)
                     st.session_state.coordinator = coordinator
                     # Save selected model
                     st.session_state.selected_models['coordinator'] = coordinator_model
                     # Save to file
-                    with open('.model_selections.json', 'w') as f:
-                        json.dump(st.session_state.selected_models, f)
+                    save_model_selections(st.session_state.selected_models)
                     st.success("Coordinator agent setup successfully!")
 
         # Agent creation
@@ -113,16 +194,18 @@ with st.sidebar:
             format_func=lambda x: f"{DEFAULT_AGENT_ROLES[x]['name']}: {DEFAULT_AGENT_ROLES[x]['description']}"
         )
 
-        if st.session_state.available_models:
+        agent_provider = select_provider(api, "agent_provider")
+        agent_models = get_provider_models(agent_provider)
+        if agent_models:
             # Get saved model for this role or default to first
             default_model = st.session_state.selected_models.get(agent_role)
             default_index = 0
-            if default_model in st.session_state.available_models:
-                default_index = list(st.session_state.available_models.keys()).index(default_model)
+            if default_model in agent_models:
+                default_index = list(agent_models.keys()).index(default_model)
 
             agent_model = st.selectbox(
                 "Model",
-                list(st.session_state.available_models.keys()),
+                list(agent_models.keys()),
                 index=default_index
             )
 
@@ -131,16 +214,16 @@ with st.sidebar:
                 new_agent = Agent(
                     name=role_config["name"],
                     role=agent_role,
-                    model=st.session_state.available_models[agent_model],
-                    system_message=role_config["system_message"]
+                    model=agent_models[agent_model],
+                    system_message=role_config["system_message"],
+                    provider=agent_provider
                 )
                 st.session_state.agent_group.add_agent(new_agent)
                 st.session_state.current_agents.append(role_config["name"])
                 # Save selected model
                 st.session_state.selected_models[agent_role] = agent_model
                 # Save to file
-                with open('.model_selections.json', 'w') as f:
-                    json.dump(st.session_state.selected_models, f)
+                save_model_selections(st.session_state.selected_models)
                 st.success(f"Agent {role_config['name']} added successfully!")
         else:
             st.warning("No models available. Please check your API key.")
@@ -172,6 +255,11 @@ else:
                     )
                 with col2:
                     if st.button("🔄 Reset Chat", help="Start a new chat while keeping agent configurations"):
+                        # Stop any requests still running for the previous turn
+                        if st.session_state.turn_token:
+                            st.session_state.turn_token.cancel()
+                            st.session_state.turn_token = None
+
                         # Clear conversation history
                         st.session_state.conversations = []
 
@@ -197,11 +285,11 @@ else:
 
                 # First display coordinator if exists
                 if st.session_state.coordinator:
-                    st.write(f"• **{st.session_state.coordinator.name}** ({st.session_state.coordinator.model})")
+                    st.write(f"• **{st.session_state.coordinator.name}** ({st.session_state.coordinator.model} via {st.session_state.coordinator.provider})")
 
                 # Then display other agents
                 for agent_name, agent in agents.items():
-                    st.write(f"• **{agent_name}** ({agent.model})")
+                    st.write(f"• **{agent_name}** ({agent.model} via {agent.provider})")
 
                 # Message input
                 user_input = st.text_area("Your message")
@@ -214,21 +302,22 @@ else:
 
                     if st.button("Send"):
                         if user_input:
-                            # Add user message
-                            agents[selected_agent].add_message("user", user_input)
+                            turn_token = start_turn()
+                            stop_watching = cancel_on_rerun(turn_token)
 
                             # Get agent response
-                            response = st.session_state.agent_group.get_response(
-                                selected_agent
-                            )
-
-                            if response["success"]:
-                                # Add agent response
-                                agents[selected_agent].add_message(
-                                    "assistant",
-                                    response["response"]
+                            try:
+                                response = st.session_state.agent_group.get_single_response(
+                                    selected_agent,
+                                    user_input,
+                                    turn_token
                                 )
+                            finally:
+                                stop_watching()
 
+                            if response.get("cancelled"):
+                                update_cancellation_metrics(st.session_state.metrics, response)
+                            elif response["success"]:
                                 # Update metrics
                                 update_metrics(
                                     st.session_state.metrics,
@@ -238,9 +327,11 @@ else:
 
                                 # Save conversation
                                 st.session_state.conversations.append({
+                                    "id": uuid.uuid4().hex,
                                     "mode": "single",
                                     "agent": selected_agent,
-                                    "messages": agents[selected_agent].get_messages()
+                                    # Only this turn, so entries don't grow with the history
+                                    "messages": response["messages"]
                                 })
                             else:
                                 st.error(f"Error: {response['error']}")
@@ -251,6 +342,8 @@ else:
                     else:
                         if st.button("Send to All"):
                             if user_input:
+                                turn_token = start_turn()
+
                                 # Create a main container for all progress indicators
                                 main_container = st.container()
 
@@ -268,15 +361,27 @@ else:
                                 agent_responses_container = st.container()
 
                                 with main_container:
+                                    stop_watching = cancel_on_rerun(turn_token)
+                                    response_generator = None
                                     try:
                                         # Initialize metrics
                                         total_tokens = 0
                                         responses = []
 
                                         # Get collective response generator
-                                        response_generator = st.session_state.agent_group.get_collective_response(user_input)
+                                        response_generator = st.session_state.agent_group.get_collective_response(
+                                            user_input,
+                                            turn_token,
+                                            on_discard=lambda result: update_cancellation_metrics(
+                                                st.session_state.metrics, result
+                                            )
+                                        )
 
                                         for response in response_generator:
+                                            if response.get("cancelled"):
+                                                progress_bar.empty()
+                                                break
+
                                             if not response["success"]:
                                                 st.error(f"Error: {response.get('error', 'Unknown error')}")
                                                 progress_bar.empty()
@@ -343,6 +448,7 @@ else:
 
                                                 # Save conversation
                                                 st.session_state.conversations.append({
+                                                    "id": uuid.uuid4().hex,
                                                     "mode": "collective",
                                                     "user_input": user_input,
                                                     "coordinator_analysis": response["coordinator_analysis"],
@@ -352,19 +458,22 @@ else:
                                     except Exception as e:
                                         st.error(f"An error occurred: {str(e)}")
                                         progress_bar.empty()
+                                    finally:
+                                        # Roll back the turn now if a rerun or stop interrupted it
+                                        if response_generator:
+                                            response_generator.close()
+                                        stop_watching()
 
                 # Display conversation history
                 st.subheader("Conversation History")
-                for conv in st.session_state.conversations:
-                    if conv["mode"] == "single":
-                        with st.expander(f"Single Agent Conversation with {conv['agent']}"):
-                            st.markdown(format_conversation(conv['messages']))
-                    else:
-                        with st.expander("Collective Conversation"):
-                            st.write("**User**:", conv["user_input"])
-                            st.write("\n**Coordinator Analysis**:", conv["coordinator_analysis"])
-                            for resp in conv["responses"]:
-                                st.write(f"\n**{resp['agent']}**:", resp["response"])
+                history = st.session_state.history_renderer.render(st.session_state.conversations)
+                first_expanded = len(history) - EXPANDED_HISTORY_ENTRIES
+                for index, (conv, (title, markdown)) in enumerate(zip(st.session_state.conversations, history)):
+                    with st.expander(title):
+                        # Older entries only send their content once asked to; keyed by
+                        # entry so a toggle never carries over to a later conversation
+                        if index >= first_expanded or st.toggle("Show conversation", key=f"show_conversation_{conv['id']}"):
+                            st.markdown(markdown)
             else:
                 st.info("Add agents using the sidebar to start chatting!")
 
@@ -372,7 +481,7 @@ else:
         # Metrics display
         st.subheader("Performance Metrics")
 
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Total Tokens Used", st.session_state.metrics['total_tokens'])
         with col2:
@@ -380,6 +489,35 @@ else:
                 avg_time = sum(st.session_state.metrics['response_times']) / \
                           len(st.session_state.metrics['response_times'])
                 st.metric("Average Response Time (s)", f"{avg_time:.2f}")
+        with col3:
+            # Shared across all sessions of this server
+            coalescing_stats = {'requests': 0, 'coalesced_requests': 0}
+            for provider_api in load_router(st.session_state.api_key).providers.values():
+                for key, value in provider_api.get_stats().items():
+                    if key in coalescing_stats:
+                        coalescing_stats[key] += value
+            coalescing_stats['coalescing_ratio'] = (
+                coalescing_stats['coalesced_requests'] / coalescing_stats['requests']
+                if coalescing_stats['requests'] else 0.0
+            )
+            st.metric(
+                "Coalesced Requests",
+                coalescing_stats['coalesced_requests'],
+                help=f"{coalescing_stats['coalescing_ratio']:.1%} of "
+                     f"{coalescing_stats['requests']} completion requests shared an in-flight call"
+            )
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Cancelled Turns", st.session_state.metrics.get('cancelled_turns', 0))
+        with col2:
+            st.metric("Agent Calls Cancelled", st.session_state.metrics.get('cancelled_calls', 0))
+        with col3:
+            st.metric(
+                "Tokens Discarded",
+                st.session_state.metrics.get('discarded_tokens', 0),
+                help="Tokens spent on responses that were thrown away when their turn was cancelled"
+            )
 
         # Display charts
         create_metrics_charts(st.session_state.metrics)
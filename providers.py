@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from cancellation import CancellationToken
+
+DEFAULT_PROVIDER = "openrouter"
+
+class ProviderRouter:
+    """Route completions to named provider backends.
+
+    Every provider exposes the same generate_completion / get_models
+    contract as OpenRouterAPI. A provider may name a fallback provider (and
+    the model to use there); it is tried when the provider is unhealthy or
+    a request to it fails. Only transient failures (connection errors,
+    timeouts, 5xx) mark a provider unhealthy. Health checks are cached for
+    health_check_interval seconds.
+    """
+
+    def __init__(self, health_check_interval: float = 30.0):
+        self.providers = {}
+        self.fallbacks = {}
+        self.health_check_interval = health_check_interval
+        self.health = {}
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def add_provider(self,
+                     name: str,
+                     api,
+                     fallback: Optional[str] = None,
+                     fallback_model: Optional[str] = None):
+        """Register a backend; fallback_model defaults to the requested model"""
+        self.providers[name] = api
+        if fallback:
+            self.fallbacks[name] = (fallback, fallback_model)
+        self.stats[name] = {"requests": 0, "failures": 0, "failovers": 0}
+
+    def get_provider_names(self) -> List[str]:
+        return list(self.providers.keys())
+
+    def is_healthy(self, name: str) -> bool:
+        """Cached health of a provider, rechecked once the interval has passed"""
+        with self.lock:
+            healthy, checked_at = self.health.get(name, (None, 0.0))
+        if healthy is not None and time.time() - checked_at < self.health_check_interval:
+            return healthy
+
+        api = self.providers[name]
+        healthy = api.health_check() if hasattr(api, "health_check") else True
+        self._set_health(name, healthy)
+        return healthy
+
+    def _set_health(self, name: str, healthy: bool):
+        with self.lock:
+            self.health[name] = (healthy, time.time())
+
+    def _route(self, provider: str, model: str) -> List[tuple]:
+        """The provider followed by its fallback chain, without repeats"""
+        route = []
+        while provider in self.providers and provider not in [name for name, _ in route]:
+            route.append((provider, model))
+            provider, fallback_model = self.fallbacks.get(provider, (None, None))
+            model = fallback_model or model
+        return route
+
+    def generate_completion(self,
+                          model: str,
+                          messages: list,
+                          temperature: float = 0.7,
+                          cancel_token: Optional[CancellationToken] = None,
+                          provider: str = DEFAULT_PROVIDER) -> Dict[str, Any]:
+        """
+        Generate completion on the given provider, failing over if needed
+        """
+        route = self._route(provider, model)
+        if not route:
+            return {
+                "success": False,
+                "error": f"Unknown provider: {provider}"
+            }
+
+        errors = []
+        for index, (name, route_model) in enumerate(route):
+            is_last = index == len(route) - 1
+            if not is_last and not self.is_healthy(name):
+                errors.append(f"{name}: unhealthy")
+                self._count(name, "failovers")
+                continue
+
+            self._count(name, "requests")
+            response = self.providers[name].generate_completion(
+                model=route_model,
+                messages=messages,
+                temperature=temperature,
+                cancel_token=cancel_token
+            )
+            if response["success"] or response.get("cancelled"):
+                response["provider"] = name
+                return response
+
+            self._count(name, "failures")
+            # A bad request says nothing about the provider itself
+            if response.get("transient"):
+                self._set_health(name, False)
+            errors.append(f"{name}: {response.get('error', 'Unknown error')}")
+            if not is_last:
+                self._count(name, "failovers")
+
+        return {
+            "success": False,
+            "error": "All providers failed: " + "; ".join(errors)
+        }
+
+    def get_models(self, provider: str = DEFAULT_PROVIDER) -> Dict[str, Any]:
+        if provider not in self.providers:
+            return {
+                "success": False,
+                "error": f"Unknown provider: {provider}"
+            }
+        return self.providers[provider].get_models()
+
+    def _count(self, name: str, key: str):
+        with self.lock:
+            self.stats[name][key] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider request counts and last known health"""
+        with self.lock:
+            return {
+                name: {**counts, "healthy": self.health.get(name, (None, 0.0))[0]}
+                for name, counts in self.stats.items()
+            }
@@ -0,0 +1,143 @@
+"""Local stand-in for an OpenAI-compatible inference server.
+
+Serves GET /models and POST /chat/completions under any path prefix and
+answers every completion with a short canned reply, so agents can be run
+and measured without network access or API keys:
+
+    python stub_server.py --port 8001 --latency 0.5 --chunk-latency 0.05
+
+then point LOCAL_LLM_BASE_URL at http://127.0.0.1:8001/v1.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+STUB_MODELS = ["stub/echo", "stub/echo-large"]
+# Completions for this model are rejected with 400 Bad Request
+STUB_BAD_REQUEST_MODEL = "stub/bad-request"
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 for chunked transfer encoding, which streaming servers use
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    chunk_latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {
+                "data": [{"id": model, "object": "model"} for model in STUB_MODELS]
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path: {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path: {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        messages = payload.get("messages", [])
+        last_message = messages[-1]["content"] if messages else ""
+
+        if payload.get("model") == STUB_BAD_REQUEST_MODEL:
+            self._send_json(400, {"error": {"message": f"Model {STUB_BAD_REQUEST_MODEL} rejects every request"}})
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        content = f"[{payload.get('model', 'stub')}] Received {len(messages)} messages. Last: {last_message[:200]}"
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        completion_tokens = len(content.split())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if payload.get("stream"):
+            self._send_stream(payload.get("model"), content, usage)
+            return
+
+        self._send_json(200, {
+            "id": f"stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _send_stream(self, model: str, content: str, usage: dict):
+        """Send the reply as server-sent events, one word per chunk"""
+        def send_event(data: str):
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            for index, word in enumerate(content.split(" ")):
+                if index and self.chunk_latency:
+                    time.sleep(self.chunk_latency)
+                send_event(json.dumps({
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": (" " if index else "") + word}}]
+                }))
+            send_event(json.dumps({"model": model, "choices": [], "usage": usage}))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the request and closed its connection
+            self.close_connection = True
+
+def start_stub_server(host: str = "127.0.0.1",
+                      port: int = 0,
+                      latency: float = 0.0,
+                      chunk_latency: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub server on a background thread; returns it and its base URL"""
+    handler = type("ConfiguredStubHandler", (StubHandler,),
+                   {"latency": latency, "chunk_latency": chunk_latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each completion")
+    parser.add_argument("--chunk-latency", type=float, default=0.0,
+                        help="Seconds to wait between streamed chunks")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, args.latency, args.chunk_latency)
+    print(f"Stub server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from cancellation import CancellationToken
+from stub_server import start_stub_server
+
+@pytest.fixture
+def stub_server():
+    """Start a stub server; call the fixture with latency settings to get its base URL"""
+    servers = []
+
+    def start(latency: float = 0.0, chunk_latency: float = 0.0) -> str:
+        server, base_url = start_stub_server(latency=latency, chunk_latency=chunk_latency)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def stub_url(stub_server):
+    return stub_server()
+
+@pytest.fixture
+def dead_url():
+    # A port that was just released refuses connections
+    server, base_url = start_stub_server()
+    server.shutdown()
+    server.server_close()
+    return base_url
+
+@pytest.fixture
+def cancel_after():
+    """Return a function creating a token that cancels itself after some seconds"""
+    timers = []
+
+    def start(seconds: float) -> CancellationToken:
+        token = CancellationToken()
+        timer = threading.Timer(seconds, token.cancel)
+        timer.start()
+        timers.append(timer)
+        return token
+
+    yield start
+    for timer in timers:
+        timer.cancel()
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from agents import Agent, AgentGroup, CoordinatorAgent
+from api import OpenAICompatibleAPI
+from cancellation import CancellationToken
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+# Seconds the stub server takes to answer each call of a collective turn
+LATENCY = 0.4
+
+def make_group(url: str) -> AgentGroup:
+    group = AgentGroup(OpenAICompatibleAPI(url))
+    group.add_agent(CoordinatorAgent("Coordinator", "stub/echo", "You coordinate."))
+    group.add_agent(Agent("Coder", "coder", "stub/echo", "You write code."))
+    group.add_agent(Agent("Reviewer", "reviewer", "stub/echo", "You review code."))
+    return group
+
+def histories(group: AgentGroup) -> dict:
+    agents = [group.coordinator] + list(group.agents.values())
+    return {agent.name: list(agent.messages) for agent in agents}
+
+def test_cancel_shuts_down_a_stream_between_chunks(stub_server, cancel_after):
+    # The first chunk arrives at once; the client then blocks reading the
+    # next one, which only shutting down the socket can interrupt
+    api = OpenAICompatibleAPI(stub_server(chunk_latency=1.0))
+
+    start_time = time.time()
+    result = api.generate_completion("stub/echo", MESSAGES, cancel_token=cancel_after(0.2))
+
+    assert result["cancelled"]
+    assert time.time() - start_time < 0.6
+
+def test_adapter_unregisters_its_callbacks(stub_url):
+    token = CancellationToken()
+    result = OpenAICompatibleAPI(stub_url).generate_completion("stub/echo", MESSAGES, cancel_token=token)
+
+    assert result["success"]
+    assert token.callbacks == []
+
+@pytest.mark.parametrize("cancel_at, phases, discarded_calls", [
+    # Before the turn starts
+    (0.0, [], 4),
+    # During the first agent call
+    (LATENCY * 1.5, ["coordinator"], 3),
+    # During the final evaluation
+    (LATENCY * 3.5, ["coordinator", "agent_response", "agent_response"], 1),
+])
+def test_cancelled_turn_is_rolled_back(stub_server, cancel_after, cancel_at, phases, discarded_calls):
+    group = make_group(stub_server(latency=LATENCY))
+    before = histories(group)
+    token = cancel_after(cancel_at) if cancel_at else CancellationToken()
+    if not cancel_at:
+        token.cancel()
+    discarded = []
+
+    results = list(group.get_collective_response("Write a sort", token, on_discard=discarded.append))
+
+    assert [result["phase"] for result in results] == phases + ["cancelled"]
+    assert discarded == [results[-1]]
+    assert results[-1]["cancelled_calls"] == discarded_calls
+    # Tokens of every call that completed, including the coordinator analysis
+    if phases:
+        assert results[-1]["discarded_tokens"] > 0
+    else:
+        assert results[-1]["discarded_tokens"] == 0
+    assert histories(group) == before
+
+def test_abandoned_turn_is_rolled_back(stub_url):
+    group = make_group(stub_url)
+    before = histories(group)
+    discarded = []
+
+    turn = group.get_collective_response("Write a sort", on_discard=discarded.append)
+    first = next(turn)
+    turn.close()
+
+    assert first["phase"] == "coordinator"
+    assert histories(group) == before
+    assert len(discarded) == 1
+    assert discarded[0]["cancelled_calls"] == 3
+    assert discarded[0]["discarded_tokens"] > 0
+
+def test_finished_turn_is_kept(stub_url):
+    group = make_group(stub_url)
+    discarded = []
+
+    results = list(group.get_collective_response("Write a sort", on_discard=discarded.append))
+
+    assert results[-1]["phase"] == "complete"
+    assert results[-1]["success"]
+    assert discarded == []
+    assert len(group.agents["Coder"].messages) == 2
+
+def test_cancelled_single_agent_turn_is_rolled_back(stub_server, cancel_after):
+    group = make_group(stub_server(latency=LATENCY))
+    before = histories(group)
+
+    response = group.get_single_response("Coder", "Write a sort", cancel_after(0.1))
+
+    assert response["cancelled"]
+    assert histories(group) == before
+
+def test_single_agent_turn_returns_its_messages(stub_url):
+    group = make_group(stub_url)
+
+    response = group.get_single_response("Coder", "Write a sort")
+
+    assert response["success"]
+    assert [message["role"] for message in response["messages"]] == ["user", "assistant"]
+    assert group.agents["Coder"].messages[1:] == response["messages"]
@@ -0,0 +1,113 @@
+import time
+
+from api import OpenAICompatibleAPI
+from cassette import Cassette
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+PAYLOAD = {"model": "stub/echo", "messages": MESSAGES, "temperature": 0.7}
+
+def test_record_then_replay_offline(stub_url, tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    recorder = OpenAICompatibleAPI(stub_url, cassette=Cassette(path, mode="record"))
+    recorded = recorder.generate_completion("stub/echo", MESSAGES)
+    recorded_models = recorder.get_models()
+    recorder.get_models()
+
+    # Nothing listens on this URL, so every answer must come from the cassette
+    player = OpenAICompatibleAPI("http://127.0.0.1:1/v1", cassette=Cassette(path))
+    assert recorded["success"]
+    assert player.generate_completion("stub/echo", MESSAGES) == recorded
+    assert player.get_models() == recorded_models
+    # The model listing is recorded once however often it is fetched
+    assert len(player.cassette.index[Cassette.make_key("models", {})]) == 1
+
+def test_streamed_chunks_are_recorded(stub_server, tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    url = stub_server(chunk_latency=0.02)
+    recorder = OpenAICompatibleAPI(url, cassette=Cassette(path, mode="record"))
+    recorded = recorder.generate_completion("stub/echo", MESSAGES)
+
+    chunks = []
+    Cassette(path).replay("chat/completions", PAYLOAD, on_chunk=chunks.append)
+
+    assert "".join(chunks) == recorded["response"]
+    entry = recorder.cassette.index[Cassette.make_key("chat/completions", PAYLOAD)][0]
+    offsets = [offset for offset, _ in entry["chunks"]]
+    assert offsets == sorted(offsets)
+    assert offsets[-1] - offsets[0] >= 0.02 * (len(offsets) - 1)
+
+def test_realtime_replay_follows_chunk_offsets(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    Cassette(path, mode="record").record(
+        "chat/completions", PAYLOAD, {"success": True, "response": "a b"}, 0.3,
+        chunks=[(0.1, "a"), (0.2, " b")]
+    )
+
+    start_time = time.time()
+    arrivals = []
+    result = Cassette(path, realtime=True).replay(
+        "chat/completions", PAYLOAD, on_chunk=lambda delta: arrivals.append(time.time() - start_time)
+    )
+    elapsed = time.time() - start_time
+
+    assert result["response"] == "a b"
+    assert 0.1 <= arrivals[0] < 0.2 <= arrivals[1]
+    assert elapsed >= 0.3
+
+def test_identical_requests_replay_in_order_then_repeat_last(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    recorder = Cassette(path, mode="record")
+    recorder.record("chat/completions", PAYLOAD, {"success": True, "response": "first"}, 0.0)
+    recorder.record("chat/completions", PAYLOAD, {"success": True, "response": "second"}, 0.0)
+
+    player = Cassette(path)
+    replies = [player.replay("chat/completions", PAYLOAD)["response"] for _ in range(3)]
+    player.rewind()
+
+    assert replies == ["first", "second", "second"]
+    assert player.replay("chat/completions", PAYLOAD)["response"] == "first"
+
+def test_replay_miss(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    Cassette(path, mode="record").record("chat/completions", PAYLOAD, {"success": True}, 0.0)
+
+    result = Cassette(path).replay("chat/completions", {**PAYLOAD, "temperature": 0.2})
+
+    assert not result["success"]
+    assert result["error"].startswith("No recorded response for chat/completions request")
+
+def test_transient_failures_are_not_recorded(dead_url, tmp_path):
+    cassette = Cassette(str(tmp_path / "session.jsonl"), mode="record")
+    api = OpenAICompatibleAPI(dead_url, cassette=cassette)
+
+    completion = api.generate_completion("stub/echo", MESSAGES)
+    models = api.get_models()
+
+    assert completion["transient"] and models["transient"]
+    assert cassette.index == {}
+
+def test_cancelled_requests_are_not_recorded(stub_server, tmp_path, cancel_after):
+    cassette = Cassette(str(tmp_path / "session.jsonl"), mode="record")
+    api = OpenAICompatibleAPI(stub_server(latency=2.0), cassette=cassette)
+
+    result = api.generate_completion("stub/echo", MESSAGES, cancel_token=cancel_after(0.1))
+
+    assert result["cancelled"]
+    assert cassette.index == {}
+
+def test_realtime_replay_is_cancellable(tmp_path, cancel_after):
+    path = str(tmp_path / "session.jsonl")
+    Cassette(path, mode="record").record(
+        "chat/completions", PAYLOAD, {"success": True, "response": "a b"}, 5.0,
+        chunks=[(1.0, "a"), (4.0, " b")]
+    )
+
+    chunks = []
+    start_time = time.time()
+    result = Cassette(path, realtime=True).replay(
+        "chat/completions", PAYLOAD, cancel_token=cancel_after(0.1), on_chunk=chunks.append
+    )
+
+    assert result["cancelled"]
+    assert chunks == []
+    assert time.time() - start_time < 1.0
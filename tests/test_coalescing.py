@@ -0,0 +1,89 @@
+import threading
+import time
+
+from api import OpenAICompatibleAPI
+from coalescing import CoalescingAPI
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+class RecordingAPI:
+    """Upstream wrapper that keeps every result it returns"""
+
+    def __init__(self, api):
+        self.api = api
+        self.results = []
+        self.finished = threading.Event()
+
+    def generate_completion(self, **kwargs):
+        result = self.api.generate_completion(**kwargs)
+        self.results.append(result)
+        self.finished.set()
+        return result
+
+def run_concurrently(api, cancel_tokens):
+    """Send the same completion once per token from separate threads"""
+    results = [None] * len(cancel_tokens)
+
+    def call(index):
+        results[index] = api.generate_completion("stub/echo", MESSAGES, cancel_token=cancel_tokens[index])
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(cancel_tokens))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+def test_identical_calls_share_one_upstream_request(stub_server):
+    upstream = RecordingAPI(OpenAICompatibleAPI(stub_server(latency=0.3)))
+    api = CoalescingAPI(upstream)
+
+    results = run_concurrently(api, [None] * 5)
+
+    assert all(result["success"] for result in results)
+    assert len({result["response"] for result in results}) == 1
+    # Every caller gets its own copy
+    assert len({id(result) for result in results}) == 5
+    assert len(upstream.results) == 1
+    stats = api.get_stats()
+    assert stats["upstream_requests"] == 1
+    assert stats["coalesced_requests"] == 4
+    assert stats["coalescing_ratio"] == 0.8
+
+def test_cancelled_waiter_leaves_others_waiting(stub_server, cancel_after):
+    upstream = RecordingAPI(OpenAICompatibleAPI(stub_server(latency=0.5)))
+    api = CoalescingAPI(upstream)
+
+    cancelled, completed = run_concurrently(api, [cancel_after(0.1), None])
+
+    assert cancelled["cancelled"]
+    assert completed["success"]
+    stats = api.get_stats()
+    assert stats["cancelled_waiters"] == 1
+    assert stats["cancelled_upstream_requests"] == 0
+
+def test_upstream_request_is_cancelled_when_every_waiter_leaves(stub_server, cancel_after):
+    upstream = RecordingAPI(OpenAICompatibleAPI(stub_server(latency=2.0)))
+    api = CoalescingAPI(upstream)
+
+    start_time = time.time()
+    results = run_concurrently(api, [cancel_after(0.1), cancel_after(0.2)])
+
+    assert all(result["cancelled"] for result in results)
+    assert time.time() - start_time < 1.0
+    assert upstream.finished.wait(1.0)
+    assert upstream.results[0]["cancelled"]
+    assert api.get_stats()["cancelled_upstream_requests"] == 1
+
+def test_call_after_abandoned_flight_starts_a_new_request(stub_server, cancel_after):
+    upstream = RecordingAPI(OpenAICompatibleAPI(stub_server(latency=0.5)))
+    api = CoalescingAPI(upstream)
+
+    abandoned = api.generate_completion("stub/echo", MESSAGES, cancel_token=cancel_after(0.1))
+    fresh = api.generate_completion("stub/echo", MESSAGES)
+
+    assert abandoned["cancelled"]
+    assert fresh["success"]
+    stats = api.get_stats()
+    assert stats["upstream_requests"] == 2
+    assert stats["coalesced_requests"] == 0
@@ -0,0 +1,91 @@
+from api import OpenAICompatibleAPI
+from providers import ProviderRouter
+from stub_server import STUB_BAD_REQUEST_MODEL
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+def test_healthy_provider_serves_request(stub_url):
+    router = ProviderRouter()
+    router.add_provider("local", OpenAICompatibleAPI(stub_url))
+
+    response = router.generate_completion("stub/echo", MESSAGES, provider="local")
+
+    assert response["success"]
+    assert response["provider"] == "local"
+    assert response["response"].startswith("[stub/echo]")
+    assert response["tokens"] > 0
+    assert router.get_stats()["local"]["requests"] == 1
+
+def test_unhealthy_provider_fails_over(stub_url, dead_url):
+    router = ProviderRouter()
+    router.add_provider("openrouter", OpenAICompatibleAPI(stub_url))
+    router.add_provider("local", OpenAICompatibleAPI(dead_url), fallback="openrouter")
+
+    response = router.generate_completion("stub/echo", MESSAGES, provider="local")
+
+    assert response["success"]
+    assert response["provider"] == "openrouter"
+    # The fallback keeps the requested model when none is configured
+    assert response["response"].startswith("[stub/echo]")
+    stats = router.get_stats()["local"]
+    assert stats["healthy"] is False
+    assert stats["failovers"] == 1
+    assert stats["requests"] == 0
+
+def test_health_check_is_cached(stub_url, dead_url):
+    router = ProviderRouter(health_check_interval=60)
+    local = OpenAICompatibleAPI(dead_url)
+    router.add_provider("openrouter", OpenAICompatibleAPI(stub_url))
+    router.add_provider("local", local, fallback="openrouter")
+
+    router.generate_completion("stub/echo", MESSAGES, provider="local")
+    # Pointing the provider at a live server has no effect until the interval passes
+    local.base_url = stub_url
+    response = router.generate_completion("stub/echo", MESSAGES, provider="local")
+
+    assert response["provider"] == "openrouter"
+    assert router.get_stats()["local"]["failovers"] == 2
+
+def test_fallback_model_is_substituted(stub_url, dead_url):
+    router = ProviderRouter()
+    router.add_provider("openrouter", OpenAICompatibleAPI(stub_url))
+    router.add_provider("local", OpenAICompatibleAPI(dead_url),
+                        fallback="openrouter", fallback_model="stub/echo-large")
+
+    response = router.generate_completion("llama-3-8b", MESSAGES, provider="local")
+
+    assert response["success"]
+    assert response["response"].startswith("[stub/echo-large]")
+
+def test_bad_request_fails_over_without_marking_unhealthy(stub_url):
+    router = ProviderRouter()
+    router.add_provider("openrouter", OpenAICompatibleAPI(stub_url))
+    router.add_provider("local", OpenAICompatibleAPI(stub_url),
+                        fallback="openrouter", fallback_model="stub/echo")
+
+    response = router.generate_completion(STUB_BAD_REQUEST_MODEL, MESSAGES, provider="local")
+
+    assert response["success"]
+    assert response["provider"] == "openrouter"
+    stats = router.get_stats()["local"]
+    assert stats["failures"] == 1
+    assert stats["healthy"] is True
+
+def test_connection_error_on_last_provider_is_reported(dead_url):
+    router = ProviderRouter()
+    router.add_provider("local", OpenAICompatibleAPI(dead_url))
+
+    response = router.generate_completion("stub/echo", MESSAGES, provider="local")
+
+    assert not response["success"]
+    assert response["error"].startswith("All providers failed: local:")
+    assert router.get_stats()["local"]["healthy"] is False
+
+def test_unknown_provider():
+    router = ProviderRouter()
+    router.add_provider("local", OpenAICompatibleAPI("http://127.0.0.1:1/v1"))
+
+    response = router.generate_completion("stub/echo", MESSAGES, provider="missing")
+
+    assert response == {"success": False, "error": "Unknown provider: missing"}
+    assert router.get_models("missing")["success"] is False
@@ -0,0 +1,59 @@
+from agents import Agent, AgentGroup
+from api import OpenAICompatibleAPI
+from utils import IncrementalRenderer, format_history_entry
+
+def counting_renderer():
+    calls = []
+
+    def format_item(item):
+        calls.append(item)
+        return f"rendered {item['text']}"
+
+    return IncrementalRenderer(format_item), calls
+
+def test_only_new_items_are_formatted():
+    renderer, calls = counting_renderer()
+    items = [{"text": "a"}, {"text": "b"}]
+
+    renderer.render(items)
+    items.append({"text": "c"})
+    rendered = renderer.render(items)
+    renderer.render(items)
+
+    assert rendered == ["rendered a", "rendered b", "rendered c"]
+    assert [item["text"] for item in calls] == ["a", "b", "c"]
+
+def test_shrunk_list_is_rendered_from_scratch():
+    renderer, calls = counting_renderer()
+    items = [{"text": "a"}, {"text": "b"}]
+    renderer.render(items)
+
+    # A reset followed by a new conversation
+    rendered = renderer.render([{"text": "c"}])
+
+    assert rendered == ["rendered c"]
+    assert len(calls) == 3
+
+def test_replaced_last_item_is_rendered_from_scratch():
+    renderer, calls = counting_renderer()
+    first = {"text": "a"}
+    renderer.render([first, {"text": "b"}])
+
+    # Same length, but the list was rebuilt
+    rendered = renderer.render([first, {"text": "c"}])
+
+    assert rendered == ["rendered a", "rendered c"]
+    assert [item["text"] for item in calls] == ["a", "b", "a", "c"]
+
+def test_single_agent_entry_holds_only_its_turn(stub_url):
+    group = AgentGroup(OpenAICompatibleAPI(stub_url))
+    group.add_agent(Agent("Coder", "coder", "stub/echo", "You write code."))
+    group.get_single_response("Coder", "first question")
+
+    response = group.get_single_response("Coder", "second question")
+    title, markdown = format_history_entry({"mode": "single", "agent": "Coder", "messages": response["messages"]})
+
+    assert title == "Single Agent Conversation with Coder"
+    assert markdown.startswith("**User**: second question")
+    assert "first question" not in markdown
+    assert "You write code." not in markdown
@@ -1,15 +1,55 @@
+import threading
+import warnings
+from typing import Any, Callable, Optional
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+from cancellation import CancellationToken
+
+def format_turn(label: str, content: str) -> str:
+    """Markdown fragment for one turn"""
+    return f"**{label}**: {content}\n\n"
 
 def format_conversation(messages: list) -> str:
     """Format conversation for display"""
-    formatted = ""
-    for msg in messages:
-        role = msg["role"].capitalize()
-        content = msg["content"]
-        formatted += f"**{role}**: {content}\n\n"
-    return formatted
+    return "".join(format_turn(msg["role"].capitalize(), msg["content"]) for msg in messages)
+
+def format_history_entry(conv: dict) -> tuple:
+    """Expander title and Markdown body for a conversation history entry"""
+    if conv["mode"] == "single":
+        return (f"Single Agent Conversation with {conv['agent']}",
+                format_conversation(conv["messages"]))
+
+    fragments = [
+        format_turn("User", conv["user_input"]),
+        format_turn("Coordinator Analysis", conv["coordinator_analysis"])
+    ]
+    fragments += [format_turn(resp["agent"], resp["response"]) for resp in conv["responses"]]
+    return "Collective Conversation", "".join(fragments)
+
+class IncrementalRenderer:
+    """Renders a growing list of items, formatting only items added since the last call.
+
+    The list is re-rendered from scratch if it shrank or its last rendered
+    item was replaced, e.g. after a chat reset.
+    """
+
+    def __init__(self, format_item: Callable[[Any], Any]):
+        self.format_item = format_item
+        self.sources = []
+        self.rendered = []
+
+    def render(self, items: list) -> list:
+        seen = len(self.sources)
+        if len(items) < seen or (seen and items[seen - 1] is not self.sources[-1]):
+            self.sources = []
+            self.rendered = []
+            seen = 0
+
+        for item in items[seen:]:
+            self.sources.append(item)
+            self.rendered.append(self.format_item(item))
+        return self.rendered
 
 def create_metrics_charts(metrics: dict):
     """Create visualization charts for metrics"""
@@ -37,3 +77,56 @@ def update_metrics(metrics: dict, response: dict, model: str):
         metrics['total_tokens'] += response['tokens']
         metrics['response_times'].append(response['time'])
         metrics['model_usage'][model] = metrics['model_usage'].get(model, 0) + 1
+
+def update_cancellation_metrics(metrics: dict, response: dict):
+    """Record the calls and tokens saved by cancelling a turn"""
+    metrics['cancelled_turns'] = metrics.get('cancelled_turns', 0) + 1
+    metrics['cancelled_calls'] = metrics.get('cancelled_calls', 0) + response.get('cancelled_calls', 1)
+    metrics['discarded_tokens'] = metrics.get('discarded_tokens', 0) + response.get('discarded_tokens', 0)
+
+# Streamlit has no public API for a pending rerun or stop, so
+# rerun_requested_probe reads the private ScriptRequests._state. It has only
+# been checked against these releases; on any other version rerun-triggered
+# cancellation is turned off with a warning instead of failing silently.
+SCRIPT_REQUESTS_VERIFIED_VERSIONS = ("1.42",)
+
+def rerun_requested_probe(ctx) -> Optional[Callable[[], bool]]:
+    """Return a function reporting whether a rerun or stop is pending for
+    the script run context, or None if this Streamlit version is unsupported"""
+    version = ".".join(st.__version__.split(".")[:2])
+    if version not in SCRIPT_REQUESTS_VERIFIED_VERSIONS:
+        warnings.warn(f"Rerun-triggered cancellation is not supported on Streamlit {st.__version__}")
+        return None
+
+    from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequestType
+
+    script_requests = getattr(ctx, "script_requests", None)
+    if script_requests is None or not hasattr(script_requests, "_state"):
+        return None
+    return lambda: script_requests._state != ScriptRequestType.CONTINUE
+
+def cancel_on_rerun(token: CancellationToken):
+    """Cancel token when this session reruns, stops or disconnects.
+
+    Streamlit only interrupts a script at its next st.* call, so a script
+    blocked on an API request would otherwise run it to completion.
+    Returns a function that stops watching.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    stopped = threading.Event()
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return stopped.set
+    rerun_requested = rerun_requested_probe(ctx)
+
+    def watch():
+        while not stopped.wait(0.1) and not token.cancelled:
+            interrupted = rerun_requested is not None and rerun_requested()
+            disconnected = Runtime.exists() and not Runtime.instance().is_active_session(ctx.session_id)
+            if interrupted or disconnected:
+                token.cancel()
+
+    threading.Thread(target=watch, daemon=True).start()
+    return stopped.set